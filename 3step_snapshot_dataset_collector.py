@@ -17,15 +17,10 @@ os.makedirs(SAVE_DIR, exist_ok=True)
 def arduino_send(cmd, ser, wait=1):
     ser.write((cmd.strip() + '\n').encode('ascii'))
     time.sleep(wait)
-    lines = []
-    while ser.in_waiting:
-        try:
-            line = ser.readline().decode(errors='ignore').strip()
-        except Exception:
-            break
-        if line:
-            lines.append(line)
-    return '\n'.join(lines)
+    # One bulk read of everything buffered instead of per-line readline calls
+    data = ser.read(ser.in_waiting)
+    lines = [line.strip() for line in data.decode('ascii', 'ignore').splitlines()]
+    return '\n'.join(line for line in lines if line)
 
 import re
 def get_position_from_response(resp):
@@ -35,21 +30,21 @@ def get_position_from_response(resp):
     return None
 
 def confirm_move(ser, timeout=8, prev_position=None):
-    # Wait for Arduino to confirm move by detecting Position value change
-    start = time.time()
+    # Wait for Arduino to confirm move by detecting Position value change.
+    # Use a tight serial timeout and react as soon as a reply line lands,
+    # instead of a blind 0.5 s sleep per poll that adds up to seconds of
+    # wasted wall time when the move finishes in milliseconds.
     last_position = prev_position
-    while time.time() - start < timeout:
-        ser.write(b'Q\n')
-        time.sleep(0.5)
-        resp = ''
-        while ser.in_waiting:
-            try:
-                line = ser.readline().decode(errors='ignore').strip()
-            except Exception:
-                break
-            if line:
-                resp += line + '\n'
-        if resp:
+    old_timeout = ser.timeout
+    ser.timeout = 0.1
+    try:
+        for _ in range(int(timeout / 0.1)):
+            if not ser.in_waiting:
+                ser.write(b'Q\n')
+            line = ser.read_until(b'\n', size=128)
+            if not line:
+                continue
+            resp = line.decode('ascii', 'ignore')
             print('Arduino response:', repr(resp))
             pos = get_position_from_response(resp)
             if last_position is not None and pos is not None and pos != last_position:
@@ -57,6 +52,8 @@ def confirm_move(ser, timeout=8, prev_position=None):
                 return pos
             elif last_position is None and pos is not None:
                 last_position = pos
+    finally:
+        ser.timeout = old_timeout
     print('Warning: Move not confirmed by Arduino.')
     return last_position
 
@@ -95,14 +92,7 @@ print('Taking 3 snapshots: normal, +50 steps, -50 steps')
 print('Moving to normal position...')
 ser.write(b'Q\n')
 time.sleep(0.5)
-resp = ''
-while ser.in_waiting:
-    try:
-        line = ser.readline().decode(errors='ignore').strip()
-    except Exception:
-        break
-    if line:
-        resp += line + '\n'
+resp = ser.read(ser.in_waiting).decode('ascii', 'ignore')
 init_position = get_position_from_response(resp)
 print(f'Initial position: {init_position}')
 take_snapshot('normal')
@@ -1,56 +1,197 @@
-from flask import Flask, render_template_string, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response
 from ultralytics import YOLO
+import torch
 import cv2
 import numpy as np
 import time
+import os
 import serial
 import random
+import threading
+import queue
+import functools
+import json
+from collections import deque
+
+# Optional JIT for the fused Tenengrad kernel below
+try:
+    import numba
+except Exception:
+    numba = None
+
+# libjpeg-turbo SIMD JPEG encoder; fall back to cv2.imencode without it
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    TJ = TurboJPEG()
+except Exception:
+    TJ = None
 
 app = Flask(__name__)
 model = YOLO(r"best.pt")
+model.fuse()
+# FP16 halves memory traffic and doubles tensor-core throughput; the
+# accuracy loss is negligible for glitter blobs. Set it through the
+# predictor's own knob so AutoBackend casts model and inputs together;
+# a manual .half() gets undone (or mismatched) on the first predict.
+# CPU stays FP32.
+if torch.cuda.is_available():
+    model.overrides['device'] = 0
+    model.overrides['half'] = True
 
 SERIAL_PORT = '/dev/serial0'
 CAM_INDEX = 0
 OBJECTIVES = {4: '4x', 10: '10x', 40: '40x'}
 STEP_SIZES = {'coarse': 500, 'medium': 250, 'fine': 100}
 
+# Debug only: saving the sweep video costs a full encode pass per frame
+SAVE_SWEEP_VIDEO = os.environ.get('SAVE_SWEEP', '0') == '1'
+
+# One serial connection for the whole app. Re-opening the port per
+# request toggles DTR, which resets the Arduino, and costs ~1 s each
+# time. The lock serializes access from Flask worker threads.
+try:
+    SER = serial.Serial(SERIAL_PORT, 9600, timeout=2)
+    time.sleep(2)  # let the board finish its reset after the open
+except Exception:
+    SER = None
+SER_LOCK = threading.Lock()
+
+# One camera for the whole app. Opening /dev/video* and renegotiating
+# the format per request takes hundreds of ms and the consumers would
+# otherwise fight over the device. A background thread owns all reads
+# and publishes the newest frame; everyone else takes snapshots.
+CAM = cv2.VideoCapture(CAM_INDEX)
+# Ask the camera for compressed MJPEG so USB bandwidth and decode cost
+# drop compared to raw YUYV at 1280x960
+CAM.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+CAM.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+CAM.set(cv2.CAP_PROP_FRAME_HEIGHT, 960)
+
+latest_frame = None
+latest_frame_id = 0
+FRAME_LOCK = threading.Condition()
+
+def camera_loop():
+    global latest_frame, latest_frame_id
+    while True:
+        ok, frame = CAM.read()
+        if not ok:
+            time.sleep(0.1)
+            continue
+        with FRAME_LOCK:
+            latest_frame = frame
+            latest_frame_id += 1
+            FRAME_LOCK.notify_all()
+
+def grab_frame(last_id=None, timeout=5):
+    # Snapshot the newest frame; pass the previous id to wait for a
+    # fresher one. Returns (None, last_id) on timeout rather than
+    # handing back the same stale frame again.
+    with FRAME_LOCK:
+        if last_id is not None:
+            if not FRAME_LOCK.wait_for(lambda: latest_frame_id != last_id, timeout):
+                return None, last_id
+        elif latest_frame is None:
+            FRAME_LOCK.wait_for(lambda: latest_frame is not None, timeout)
+        if latest_frame is None:
+            return None, last_id
+        return latest_frame.copy(), latest_frame_id
+
+threading.Thread(target=camera_loop, daemon=True).start()
+
+# When OpenCV is built with CUDA the Sobel pass can ride the same GPU
+# as YOLO; otherwise fall back to the vectorized CV_16S CPU path below.
+try:
+    CUDA_SOBEL_GX = cv2.cuda.createSobelFilter(cv2.CV_8U, cv2.CV_16S, 1, 0, ksize=3)
+    CUDA_SOBEL_GY = cv2.cuda.createSobelFilter(cv2.CV_8U, cv2.CV_16S, 0, 1, ksize=3)
+except Exception:
+    CUDA_SOBEL_GX = CUDA_SOBEL_GY = None
+
+if numba is not None:
+    # One fused sweep over the uint8 image: both Sobel gradients and the
+    # squared-magnitude accumulation per pixel, no intermediate buffers.
+    # The OpenCV path below walks the image four times instead.
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def tenengrad_fused(img):
+        h, w = img.shape
+        acc = 0.0
+        for y in numba.prange(1, h - 1):
+            row = 0.0
+            for x in range(1, w - 1):
+                # Read each neighbor through a signed cast first: unary
+                # minus on a uint8 wraps at 8 bits before promotion, so
+                # -img[...] would be off by 256 for nonzero pixels.
+                tl = np.int32(img[y-1, x-1])
+                tc = np.int32(img[y-1, x])
+                tr = np.int32(img[y-1, x+1])
+                ml = np.int32(img[y, x-1])
+                mr = np.int32(img[y, x+1])
+                bl = np.int32(img[y+1, x-1])
+                bc = np.int32(img[y+1, x])
+                br = np.int32(img[y+1, x+1])
+                gx = (tr + 2*mr + br) - (tl + 2*ml + bl)
+                gy = (bl + 2*bc + br) - (tl + 2*tc + tr)
+                row += gx * gx + gy * gy
+            acc += row
+        return acc / ((h - 2) * (w - 2))
+
 def tenengrad_focus_measure(gray: np.ndarray) -> float:
-    gx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    gy = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    g2 = gx * gx + gy * gy
-    return float(np.mean(g2))
-
-def arduino_send(cmd, ser):
-    ser.write((cmd.strip() + '\n').encode('ascii'))
-    time.sleep(1)
-    lines = []
-    while ser.in_waiting:
+    if CUDA_SOBEL_GX is not None:
+        g = cv2.cuda_GpuMat()
+        g.upload(gray)
+        gx = CUDA_SOBEL_GX.apply(g)
+        gy = CUDA_SOBEL_GY.apply(g)
+        s2 = cv2.cuda.sqrSum(gx)[0] + cv2.cuda.sqrSum(gy)[0]
+        return float(s2) / (gray.shape[0] * gray.shape[1])
+    if numba is not None:
+        return float(tenengrad_fused(gray))
+    # 16-bit Sobel is plenty: ksize=3 on uint8 stays within +/-1020,
+    # and gx^2 + gy^2 fits in int32. Much cheaper than CV_64F.
+    gx = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
+    g2 = cv2.add(cv2.multiply(gx, gx, dtype=cv2.CV_32S),
+                 cv2.multiply(gy, gy, dtype=cv2.CV_32S))
+    return float(cv2.mean(g2)[0])
+
+def arduino_send(cmd):
+    if SER is None:
+        return 'Error: serial port not available'
+    with SER_LOCK:
+        SER.write((cmd.strip() + '\n').encode('ascii'))
+        lines = []
+        # Block only until the first reply line instead of a fixed 1 s
+        # sleep. Multi-line replies (Q prints ~9 lines) arrive a few ms
+        # apart at 9600 baud, so in_waiting is routinely 0 between
+        # lines; keep reading with a short inter-line timeout until a
+        # read comes back empty.
+        line = SER.read_until(b'\n')
+        old_timeout = SER.timeout
+        SER.timeout = 0.2
         try:
-            line = ser.readline().decode(errors='ignore').strip()
-        except Exception:
-            break
-        if line:
-            lines.append(line)
+            while line:
+                text = line.decode(errors='ignore').strip()
+                if text:
+                    lines.append(text)
+                line = SER.read_until(b'\n')
+        finally:
+            SER.timeout = old_timeout
     return '\n'.join(lines)
 
 def autofocus_sweep(objective, step_size):
     sweep_speed = 12
-    video_path = "sweep.mp4"
-    ser = serial.Serial(SERIAL_PORT, 9600, timeout=2)
-    time.sleep(4)
-    arduino_send(f'O{objective}', ser)
-    arduino_send(f'V{sweep_speed}', ser)
-    arduino_send('Z', ser)
+    arduino_send(f'O{objective}')
+    arduino_send(f'V{sweep_speed}')
+    arduino_send('Z')
     # Wait for homing complete
     homed = False
     for _ in range(60):
         time.sleep(0.5)
-        resp = arduino_send('Q', ser)
+        resp = arduino_send('Q')
         if 'Homing complete.' in resp or 'homed' in resp.lower():
             homed = True
             break
     # Get max limit from Arduino
-    resp = arduino_send('Q', ser)
+    resp = arduino_send('Q')
     max_steps = 9000
     for line in resp.splitlines():
         if 'Max limit:' in line:
@@ -58,54 +199,101 @@ def autofocus_sweep(objective, step_size):
                 max_steps = int(line.split('Max limit:')[1].strip())
             except Exception:
                 pass
-    cap = cv2.VideoCapture(CAM_INDEX)
+    if not CAM.isOpened():
+        return {'error': 'Could not open camera'}
+    # Pipeline the stages without breaking the frame<->Z mapping: the
+    # motor thread posts a token to capture_q only after its move has
+    # settled, and the reader then takes one frame captured *after*
+    # that token, so a scored frame always belongs to the position it
+    # is recorded under and is never grabbed mid-move. Scoring of
+    # frame N overlaps with the move to N+1, which is where the wall
+    # time goes anyway.
+    frame_q = queue.Queue(maxsize=4)
+    move_q = queue.Queue(maxsize=2)
+    capture_q = queue.Queue(maxsize=2)
+    stop_event = threading.Event()
+
+    def reader():
+        while not stop_event.is_set():
+            try:
+                capture_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Wait for a frame newer than "now", i.e. exposed after the
+            # move settled
+            with FRAME_LOCK:
+                cur_id = latest_frame_id
+            frame = None
+            while frame is None and not stop_event.is_set():
+                frame, cur_id = grab_frame(cur_id, timeout=0.5)
+            if frame is not None:
+                frame_q.put(frame)
+            capture_q.task_done()
+
+    def motor():
+        while not stop_event.is_set():
+            try:
+                move_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            arduino_send(f'G{step_size}')
+            time.sleep(1.5)
+            capture_q.put(None)
+            move_q.task_done()
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    motor_thread = threading.Thread(target=motor, daemon=True)
+    reader_thread.start()
+    motor_thread.start()
+
+    # MJPG is per-frame JPEG via libjpeg-turbo's SIMD, so the debug
+    # capture avoids mp4v's inter-frame encode stalls
+    writer = None
+    if SAVE_SWEEP_VIDEO:
+        fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+        writer = cv2.VideoWriter('sweep.avi', fourcc, 25, (1280, 960))
+
+    frame_positions = []
+    best_idx = -1
+    best_score = -1.0
+    pos = 0
+    # The frame for position 0 needs no move, just a fresh capture
+    capture_q.put(None)
     try:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 960)
-        if not cap.isOpened():
-            ser.close()
-            return {'error': 'Could not open camera'}
-        width = 1280
-        height = 960
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        writer = cv2.VideoWriter(video_path, fourcc, 25, (width, height))
-        frame_positions = []
-        pos = 0
         while pos <= max_steps:
-            ret, frame = cap.read()
-            if not ret:
+            try:
+                frame = frame_q.get(timeout=10)
+            except queue.Empty:
                 break
-            writer.write(frame)
-            frame_positions.append(pos)
+            # Start the next move now so it runs while this frame is
+            # being scored
             if pos + step_size <= max_steps:
-                arduino_send(f'G{step_size}', ser)
-                time.sleep(1.5)
+                move_q.put(None)
+            if writer is not None:
+                writer.write(frame)
+            # Score focus inline so frames never touch disk. Only the
+            # argmax across the sweep matters, so a half-size image is
+            # fine - the focus peak lands at the same Z either way.
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            small = cv2.resize(gray, (0, 0), fx=0.5, fy=0.5,
+                               interpolation=cv2.INTER_AREA)
+            score = tenengrad_focus_measure(small)
+            if score > best_score:
+                best_score = score
+                best_idx = len(frame_positions)
+            frame_positions.append(pos)
             pos += step_size
-        writer.release()
+        # Let any queued move finish before repositioning below
+        move_q.join()
     finally:
-        cap.release()
-    # Analyze video for best focus
-    cap = cv2.VideoCapture(video_path)
-    best_idx = -1
-    best_score = -1.0
-    idx = 0
-    scores = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        score = tenengrad_focus_measure(gray)
-        scores.append(score)
-        if score > best_score:
-            best_score = score
-            best_idx = idx
-        idx += 1
-    cap.release()
+        stop_event.set()
+        reader_thread.join(timeout=2)
+        motor_thread.join(timeout=2)
+        if writer is not None:
+            writer.release()
     target_pos = frame_positions[best_idx] if best_idx < len(frame_positions) else 0
     delta = target_pos - frame_positions[-1]
-    arduino_send(f'G{delta}', ser)
-    ser.close()
+    arduino_send(f'G{delta}')
     return {
         'frames': len(frame_positions),
         'best_idx': best_idx,
@@ -115,13 +303,30 @@ def autofocus_sweep(objective, step_size):
         'step_size': step_size
     }
 
-console_log = []
+# deque drops the oldest entry in O(1) once full
+console_log = deque(maxlen=100)
 live_detection_enabled = False
+last_glitter_result = None
+last_glitter_jpeg = None
 last_class_counts = {}
+# gen_frames writes the counts, /detection_summary reads them
+COUNTS_LOCK = threading.Lock()
+
+# Push console/count updates to the dashboard over SSE instead of
+# having every client poll. Writers bump the version and notify;
+# /events streams wake up and send the new state.
+EVENTS_COND = threading.Condition()
+events_version = 0
+
+def notify_events():
+    global events_version
+    with EVENTS_COND:
+        events_version += 1
+        EVENTS_COND.notify_all()
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    global live_detection_enabled
+    global live_detection_enabled, last_glitter_result, last_glitter_jpeg
     result = None
     if request.method == 'POST':
         if 'toggle_detection' in request.form:
@@ -137,261 +342,56 @@ def index():
             live_detection_enabled = True
             # Add result to console log
             console_log.append({'cmd': f'AUTOFOCUS ({OBJECTIVES.get(objective, objective)} {mode})', 'output': f'Result\n{result}'})
-            if len(console_log) > 100:
-                console_log.pop(0)
-    glitter_result = None
-    detection_summary = ""
+            notify_events()
     if request.args.get('pollen') == '1':
         # Run glitter detection on a single frame using YOLOv11
-        cap = cv2.VideoCapture(CAM_INDEX)
-        ret, frame = cap.read()
-        cap.release()
-        if ret:
+        frame, _ = grab_frame()
+        if frame is not None:
             results = model(frame)
             if results and results[0].boxes:
                 boxes = results[0].boxes
-                confs = boxes.conf.tolist() if hasattr(boxes, 'conf') else []
-                labels = boxes.cls.tolist() if hasattr(boxes, 'cls') else []
-                xyxys = boxes.xyxy.tolist() if hasattr(boxes, 'xyxy') else []
+                # Stay in NumPy: one device->host copy per tensor instead
+                # of a Python object per coordinate via .tolist()
+                xyxy = boxes.xyxy.to(torch.int32).cpu().numpy()
+                cls = boxes.cls.to(torch.int32).cpu().numpy()
+                conf = boxes.conf.cpu().numpy()
                 names = model.names if hasattr(model, 'names') else {0: 'Glitter'}
                 class_counts = {}
-                if confs and labels and xyxys:
-                    for i, (xyxy, label_idx, conf) in enumerate(zip(xyxys, labels, confs)):
-                        x1, y1, x2, y2 = map(int, xyxy)
-                        label = names[int(label_idx)]
-                        class_counts[label] = class_counts.get(label, 0) + 1
+                if len(xyxy):
+                    classes, counts = np.unique(cls, return_counts=True)
+                    class_counts = {names[int(c)]: int(n) for c, n in zip(classes, counts)}
+                    for (x1, y1, x2, y2), c, p in zip(xyxy, cls, conf):
+                        label = names[int(c)]
                         cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
-                        cv2.putText(frame, f'{label} {conf:.2f}', (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,0), 2)
-                    # Save annotated frame to static file for display
-                    cv2.imwrite(r'c:\Users\ahmed\Desktop\microscope\static\glitter_detect.jpg', frame)
-                    glitter_result = f"<img src='/static/glitter_detect.jpg?{int(time.time())}' style='max-width:100%;border-radius:8px;border:2px solid #6ec6ff;'>"
-                    detection_summary = "<ul style='margin-top:10px;'>" + "".join([f"<li><b>{cls}</b>: {count}</li>" for cls, count in class_counts.items()]) + "</ul>"
+                        cv2.putText(frame, f'{label} {p:.2f}', (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,0), 2)
+                    # Encode the annotated frame in memory and serve it
+                    # from there - no disk round-trip, and quality 80 is
+                    # plenty for a browser thumbnail
+                    ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+                    last_glitter_jpeg = buf.tobytes()
+                    last_glitter_result = f"<img src='/glitter_detect.jpg?{int(time.time())}' style='max-width:100%;border-radius:8px;border:2px solid #6ec6ff;'>"
                 else:
-                    glitter_result = "No glitter detected."
-                    detection_summary = ""
+                    last_glitter_result = "No glitter detected."
             else:
-                glitter_result = "No glitter detected."
-                detection_summary = ""
+                last_glitter_result = "No glitter detected."
         else:
-            glitter_result = "Camera error."
-            detection_summary = ""
-    return render_template_string('''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Microscope Dashboard</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
-        <style>
-            body { background: #181d23; color: #eaeaea; font-family: 'Segoe UI', Arial, sans-serif; }
-            .fluidd-card { background: #23272e; border-radius: 10px; box-shadow: 0 2px 8px #0002; margin-bottom: 18px; padding: 18px; }
-            .fluidd-title { font-size: 1.2rem; font-weight: 600; margin-bottom: 10px; color: #6ec6ff; }
-            .fluidd-section { margin-bottom: 24px; }
-            .fluidd-btn { background: #23272e; color: #6ec6ff; border: 1px solid #6ec6ff; border-radius: 6px; padding: 6px 16px; margin-right: 6px; }
-            .fluidd-btn:hover { background: #6ec6ff; color: #23272e; }
-            .fluidd-select { background: #23272e; color: #eaeaea; border: 1px solid #6ec6ff; border-radius: 6px; padding: 4px 8px; }
-            .fluidd-console { background: #181d23; color: #eaeaea; border: 1px solid #6ec6ff; border-radius: 8px; height: 220px; overflow-y: auto; font-size: 0.95em; padding: 10px; }
-            .fluidd-label { color: #b0b8c1; font-size: 0.95em; margin-right: 8px; }
-            .fluidd-topbar { background: #23272e; padding: 10px 24px; color: #6ec6ff; font-size: 1.3rem; font-weight: 700; letter-spacing: 1px; margin-bottom: 18px; }
-            .fluidd-sidebar { background: #23272e; position: fixed; left: 0; top: 0; bottom: 0; width: 56px; display: flex; flex-direction: column; align-items: center; padding-top: 18px; z-index: 10; }
-            .fluidd-sidebar .icon { width: 32px; height: 32px; margin-bottom: 18px; filter: invert(60%) sepia(80%) saturate(500%) hue-rotate(180deg); }
-            .fluidd-main { margin-left: 70px; }
-            .fluidd-macro-btn { background: #23272e; color: #eaeaea; border: 1px solid #6ec6ff; border-radius: 6px; padding: 4px 10px; margin: 2px; font-size: 0.95em; }
-            .fluidd-macro-btn:hover { background: #6ec6ff; color: #23272e; }
-        </style>
-    </head>
-    <body>
-        <div class="fluidd-sidebar">
-            <img src="https://fluidd.xyz/img/fluidd-icon.svg" class="icon" alt="Fluidd">
-        </div>
-        <div class="fluidd-main">
-            <div class="fluidd-topbar">microscope</div>
-            <div class="container-fluid">
-                <div class="row">
-                    <div class="col-md-7">
-                        <div class="fluidd-card fluidd-section">
-                            <div class="fluidd-title">Camera</div>
-                            <div style="display:flex; justify-content:center; align-items:center; width:100%;">
-                                <img src="/video_feed" width="800" height="600" style="border-radius:8px;border:2px solid #23272e;">
-                            </div>
-                        </div>
-                        <div class="fluidd-card fluidd-section">
-                            <div class="fluidd-title">Glitter Detection (AI)</div>
-                            <form method="post" style="margin-top:10px;">
-                                <button type="submit" name="toggle_detection" class="fluidd-btn">{{ 'Turn Detection Off' if live_detection_enabled else 'Turn Detection On' }}</button>
-                            </form>
-                            <div style="margin-top:10px; color:#6ec6ff; font-size:1.1em;">Live Detection is <b>{{ 'ON' if live_detection_enabled else 'OFF' }}</b></div>
-                            {% if glitter_result %}
-                            <div style="margin-top:10px; color:#6ec6ff; font-size:1.1em;">{{ glitter_result|safe }}</div>
-                            {% endif %}
-                            <div style="margin-top:10px; color:#6ec6ff; font-size:1.05em;">
-                                Detected Objects:
-                                <ul id="detected-objects-list" style='margin-top:6px;'>
-                                    <li>None</li>
-                                </ul>
-                            </div>
-                            <script>
-                            function updateDetectedObjects() {
-                                fetch('/detection_summary').then(r => r.json()).then(data => {
-                                    let list = document.getElementById('detected-objects-list');
-                                    let html = '';
-                                    let counts = data.counts || {};
-                                    let hasAny = false;
-                                    for (const [cls, count] of Object.entries(counts)) {
-                                        html += `<li><b>${cls}</b>: ${count}</li>`;
-                                        hasAny = true;
-                                    }
-                                    if (!hasAny) html = '<li>None</li>';
-                                    list.innerHTML = html;
-                                });
-                            }
-                            setInterval(updateDetectedObjects, 1000);
-                            updateDetectedObjects();
-                            </script>
-                        </div>
-                            <div class="fluidd-title">Autofocus</div>
-                            <form method="post" class="row g-2 align-items-center">
-                                <div class="col-auto">
-                                    <span class="fluidd-label">Objective:</span>
-                                    <select name="objective" class="fluidd-select">
-                                        <option value="4">4x</option>
-                                        <option value="10">10x</option>
-                                        <option value="40" selected>40x</option>
-                                    </select>
-                                </div>
-                                <div class="col-auto">
-                                    <span class="fluidd-label">Mode:</span>
-                                    <select name="mode" class="fluidd-select">
-                                        <option value="coarse">Coarse (500)</option>
-                                        <option value="medium" selected>Medium (250)</option>
-                                        <option value="fine">Fine (100)</option>
-                                    </select>
-                                </div>
-                                <div class="col-auto">
-                                    <button type="submit" class="fluidd-btn">Run Autofocus</button>
-                                </div>
-                            </form>
-                            <!-- Autofocus result removed from UI as requested -->
-                        </div>
-                    </div>
-                    <div class="col-md-5">
-                        <div class="fluidd-card fluidd-section">
-                            <div class="fluidd-title">Z Axis Control</div>
-                            <div class="mb-2 d-flex flex-column align-items-center" style="gap:8px;">
-                                <button type="button" class="fluidd-btn" style="width:48px;height:48px;" onclick="moveUp()" title="Up">
-                                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M12 5l-7 7h4v7h6v-7h4l-7-7z" fill="#6ec6ff"/></svg>
-                                </button>
-                                <div class="d-flex align-items-center" style="gap:8px;">
-                                    <button type="button" class="fluidd-btn" style="width:48px;height:48px;" onclick="quickCmd('Z')" title="Home">
-                                        <svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M12 3l9 9-1.5 1.5L18 12.5V20a1 1 0 0 1-1 1h-3v-5H10v5H7a1 1 0 0 1-1-1v-7.5l-1.5 1.5L3 12l9-9z" fill="#6ec6ff"/></svg>
-                                    </button>
-                                </div>
-                                <button type="button" class="fluidd-btn" style="width:48px;height:48px;" onclick="moveDown()" title="Down">
-                                    <svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg"><path d="M12 19l7-7h-4V5h-6v7H5l7 7z" fill="#6ec6ff"/></svg>
-                                </button>
-                                <div class="d-flex justify-content-center mt-2" id="step-size-group" style="gap:0;">
-                                    <button type="button" class="step-btn" data-step="50">50</button>
-                                    <button type="button" class="step-btn" data-step="100">100</button>
-                                    <button type="button" class="step-btn active" data-step="250">250</button>
-                                    <button type="button" class="step-btn" data-step="500">500</button>
-                                    <button type="button" class="step-btn" data-step="1000">1000</button>
-                                </div>
-                                <button type="button" class="fluidd-btn mt-2" style="width:120px;" onclick="quickCmd('R')">Motor Off</button>
-                            </div>
-                                <style>
-                                .step-btn {
-                                    background: #23272e;
-                                    color: #eaeaea;
-                                    border: 1px solid #444a55;
-                                    border-right: none;
-                                    border-radius: 0;
-                                    padding: 6px 18px;
-                                    font-size: 1em;
-                                    outline: none;
-                                    transition: background 0.2s, color 0.2s;
-                                }
-                                .step-btn:last-child { border-right: 1px solid #444a55; }
-                                .step-btn:first-child { border-top-left-radius: 6px; border-bottom-left-radius: 6px; }
-                                .step-btn:last-child { border-top-right-radius: 6px; border-bottom-right-radius: 6px; }
-                                .step-btn.active, .step-btn:focus {
-                                    background: #6ec6ff;
-                                    color: #23272e;
-                                    border-color: #6ec6ff;
-                                    z-index: 1;
-                                }
-                                </style>
-                        </div>
-                        <div class="fluidd-card fluidd-section">
-                            <div class="fluidd-title">Console</div>
-                            <div class="fluidd-console" id="console-log" style="border-bottom-left-radius:0;border-bottom-right-radius:0;"></div>
-                            <form id="console-form" onsubmit="event.preventDefault(); sendCmd();" class="mb-2" autocomplete="off">
-                                <input type="text" id="console-cmd" style="width:100%;background:#181d23;color:#eaeaea;border:1px solid #6ec6ff;border-top:none;border-bottom-left-radius:8px;border-bottom-right-radius:8px;padding:8px 12px;font-size:1em;outline:none;" placeholder="Enter Arduino command">
-                            </form>
-                        </div>
-                        <!-- Macros section removed -->
-                    </div>
-                </div>
-            </div>
-        </div>
-        <script>
-        function sendCmd() {
-            var cmd = document.getElementById('console-cmd').value;
-            if (!cmd.trim()) return;
-            fetch('/arduino_console', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({cmd: cmd})
-            }).then(r => r.json()).then(data => {
-                updateConsoleLog();
-                document.getElementById('console-cmd').value = '';
-            });
-        }
-        document.getElementById('console-cmd').addEventListener('keydown', function(e) {
-            if (e.key === 'Enter') {
-                e.preventDefault();
-                sendCmd();
-            }
-        });
-        function quickCmd(cmd) {
-            fetch('/arduino_console', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({cmd: cmd})
-            }).then(r => r.json()).then(data => {
-                updateConsoleLog();
-            });
-        }
-        let currentStep = 250;
-        document.querySelectorAll('.step-btn').forEach(btn => {
-            btn.addEventListener('click', function() {
-                document.querySelectorAll('.step-btn').forEach(b => b.classList.remove('active'));
-                this.classList.add('active');
-                currentStep = this.getAttribute('data-step');
-            });
-        });
-        function moveUp() {
-            quickCmd('S' + currentStep);
-            setTimeout(function() { quickCmd('U'); }, 300);
-        }
-        function moveDown() {
-            quickCmd('S' + currentStep);
-            setTimeout(function() { quickCmd('D'); }, 300);
-        }
-        function updateConsoleLog() {
-            fetch('/console_log').then(r => r.json()).then(data => {
-                document.getElementById('console-log').innerHTML = data.log.map(
-                    l => `<div><b>&gt; ${l.cmd}</b><br><pre style='margin:0;padding:0;'>${l.output}</pre></div>`
-                ).join('');
-                document.getElementById('console-log').scrollTop = document.getElementById('console-log').scrollHeight;
-            });
-        }
-        setInterval(updateConsoleLog, 1500);
-        updateConsoleLog();
-        </script>
-    </body>
-    </html>
-    ''', result=result, glitter_result=glitter_result, last_class_counts=last_class_counts)
+            last_glitter_result = "Camera error."
+    # The page itself is static; the JS fetches dynamic state from
+    # /state and /detection_summary, so Jinja only compiles it once.
+    return render_template('index.html')
+
+@app.route('/glitter_detect.jpg')
+def glitter_detect_jpg():
+    if last_glitter_jpeg is None:
+        return Response(status=404)
+    return Response(last_glitter_jpeg, mimetype='image/jpeg')
+
+@app.route('/state')
+def get_state():
+    return jsonify({
+        'detection_on': live_detection_enabled,
+        'glitter_result': last_glitter_result
+    })
 
 
 @app.route('/arduino_console', methods=['POST'])
@@ -399,73 +399,125 @@ def arduino_console():
     data = request.get_json()
     cmd = data.get('cmd', '')
     try:
-        ser = serial.Serial(SERIAL_PORT, 9600, timeout=2)
-        time.sleep(1)
-        output = arduino_send(cmd, ser)
-        ser.close()
+        output = arduino_send(cmd)
     except Exception as e:
         output = f'Error: {e}'
     # Save to log
     console_log.append({'cmd': cmd, 'output': output})
-    # Limit log size
-    if len(console_log) > 100:
-        console_log.pop(0)
+    notify_events()
     return jsonify({'output': output})
 
 @app.route('/console_log')
 def get_console_log():
-    return jsonify({'log': console_log})
+    return jsonify({'log': list(console_log)})
+
+@app.route('/events')
+def events():
+    def stream():
+        last_seen = -1
+        while True:
+            with EVENTS_COND:
+                # The timeout doubles as an SSE keepalive
+                EVENTS_COND.wait_for(lambda: events_version != last_seen, timeout=15)
+                last_seen = events_version
+            with COUNTS_LOCK:
+                counts = dict(last_class_counts)
+            payload = json.dumps({'log': list(console_log), 'counts': counts})
+            yield f'data: {payload}\n\n'
+    return Response(stream(), mimetype='text/event-stream')
 
 # --- Live Camera MJPEG Stream ---
+DETECT_SIZE = 640
+DETECT_INTERVAL = 0.25  # seconds between inference calls (~4 Hz)
+STREAM_JPEG_QUALITY = 75
+
+def encode_jpeg(frame):
+    if TJ is not None:
+        return TJ.encode(frame, quality=STREAM_JPEG_QUALITY, pixel_format=TJPF_BGR)
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_JPEG_QUALITY])
+    return buffer.tobytes()
+
+def preprocess_batch(frames, size=DETECT_SIZE):
+    # Resize once per frame, then do BGR->RGB and NHWC->NCHW as a single
+    # strided view plus one contiguous float32 copy, instead of letting
+    # the model clone/convert/normalize every frame on its own.
+    arr = np.stack([cv2.resize(f, (size, size)) for f in frames])
+    x = arr[..., ::-1].transpose(0, 3, 1, 2)
+    x = np.ascontiguousarray(x, dtype=np.float32) / 255.0
+    # The predictor moves and casts the tensor to the model's
+    # device/dtype itself (including FP16 on CUDA)
+    return torch.from_numpy(x)
+
+def draw_boxes(frame, drawn):
+    for x1, y1, x2, y2, label, p in drawn:
+        color = get_class_color(label)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f'{label} {p:.2f}', (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+
 def gen_frames():
     global live_detection_enabled, last_class_counts
-    cap = cv2.VideoCapture(CAM_INDEX)
-    try:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 960)
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
-            detection_summary = ""
-            if live_detection_enabled:
-                results = model(frame)
-                if results and results[0].boxes:
-                    boxes = results[0].boxes
-                    confs = boxes.conf.tolist() if hasattr(boxes, 'conf') else []
-                    labels = boxes.cls.tolist() if hasattr(boxes, 'cls') else []
-                    xyxys = boxes.xyxy.tolist() if hasattr(boxes, 'xyxy') else []
+    frame_id = None
+    # The UI polls counts at 1 Hz, so inferring at the full stream rate
+    # is wasted work. Run the model on the single newest frame at ~4 Hz
+    # and re-draw the last known boxes on the frames in between; every
+    # frame is yielded as soon as it is ready.
+    cached_boxes = []
+    last_infer_ts = 0.0
+    while True:
+        frame, frame_id = grab_frame(frame_id)
+        if frame is None:
+            break
+        if live_detection_enabled:
+            if time.monotonic() - last_infer_ts > DETECT_INTERVAL:
+                results = model(preprocess_batch([frame]), imgsz=DETECT_SIZE)[0]
+                boxes = results.boxes
+                drawn = []
+                if boxes:
+                    # Stay in NumPy: one device->host copy per tensor
+                    # instead of a Python object per coordinate
+                    xyxy = boxes.xyxy.cpu().numpy()
+                    cls = boxes.cls.to(torch.int32).cpu().numpy()
+                    conf = boxes.conf.cpu().numpy()
                     names = model.names if hasattr(model, 'names') else {0: 'Glitter'}
-                    class_counts = {}
-                    if confs and labels and xyxys:
-                        for i, (xyxy, label_idx, conf) in enumerate(zip(xyxys, labels, confs)):
-                            x1, y1, x2, y2 = map(int, xyxy)
-                            label = names[int(label_idx)]
-                            class_counts[label] = class_counts.get(label, 0) + 1
-                            color = get_class_color(label)
-                            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                            cv2.putText(frame, f'{label} {conf:.2f}', (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-                        detection_summary = ", ".join([f"{cls}: {count}" for cls, count in class_counts.items()])
-                        last_class_counts = class_counts.copy()
+                    # Boxes come back in DETECT_SIZE coordinates since
+                    # the model saw our pre-resized tensor; scale back.
+                    sx = frame.shape[1] / DETECT_SIZE
+                    sy = frame.shape[0] / DETECT_SIZE
+                    if len(xyxy):
+                        for (bx1, by1, bx2, by2), c, p in zip(xyxy, cls, conf):
+                            x1, x2 = int(bx1 * sx), int(bx2 * sx)
+                            y1, y2 = int(by1 * sy), int(by2 * sy)
+                            drawn.append((x1, y1, x2, y2, names[int(c)], float(p)))
+                        classes, counts = np.unique(cls, return_counts=True)
+                        with COUNTS_LOCK:
+                            last_class_counts = {names[int(c)]: int(n) for c, n in zip(classes, counts)}
+                        notify_events()
+                cached_boxes = drawn
+                last_infer_ts = time.monotonic()
             # Only draw boxes and labels, do not overlay object counts on frame
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-    finally:
-        cap.release()
+            draw_boxes(frame, cached_boxes)
+        frame_bytes = encode_jpeg(frame)
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 @app.route('/video_feed')
 def video_feed():
     return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@functools.lru_cache(maxsize=256)
 def get_class_color(label):
-    # Assign a unique color for each class label
-    random.seed(hash(label) & 0xFFFFFFFF)
-    return tuple(random.randint(64, 255) for _ in range(3))
+    # Assign a unique color for each class label. Cached so repeat boxes
+    # are a dict lookup, and a local Random so the global RNG state is
+    # left alone.
+    r = random.Random(hash(label) & 0xFFFFFFFF)
+    return tuple(r.randint(64, 255) for _ in range(3))
 
 if __name__ == '__main__':
     @app.route('/detection_summary')
     def detection_summary():
-        return jsonify({'counts': last_class_counts})
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+        with COUNTS_LOCK:
+            return jsonify({'counts': last_class_counts})
+    # The camera and serial port are opened at import time; the debug
+    # reloader would import this module in two processes and both would
+    # try to own /dev/video0 and /dev/serial0, so keep it off.
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
@@ -4,15 +4,25 @@ import os
 folder = r'C:\Users\ahmed\Desktop\microscope\snapshots'
 new_base = 'camellia_pollen'
 
-# List all jpg files in the folder
-files = [f for f in os.listdir(folder) if f.lower().endswith('.jpg')]
+# scandir avoids the extra stat per entry that listdir-based filtering costs
+files = [e.name for e in os.scandir(folder)
+         if e.is_file() and e.name.lower().endswith('.jpg')]
 files.sort()  # Optional: sort for consistent order
 
+rename_pairs = []
 for idx, filename in enumerate(files, 1):
-    old_path = os.path.join(folder, filename)
     new_name = f'{new_base}_{idx:04d}.jpg'
-    new_path = os.path.join(folder, new_name)
+    rename_pairs.append((os.path.join(folder, filename),
+                         os.path.join(folder, new_name)))
+
+# Renames must stay in sorted order: a target name can equal a source
+# that has not been renamed yet (e.g. indices shifting down when the
+# script is re-run after deleting frames), so reordering them clobbers
+for old_path, new_path in rename_pairs:
     os.rename(old_path, new_path)
-    print(f'Renamed: {filename} -> {new_name}')
 
+# One buffered report instead of a print per file
+report = '\n'.join(f'Renamed: {os.path.basename(old)} -> {os.path.basename(new)}'
+                   for old, new in rename_pairs)
+print(report)
 print('Batch rename complete.')
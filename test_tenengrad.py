@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+pytest.importorskip('numba')
+pytest.importorskip('serial')
+pytest.importorskip('flask')
+pytest.importorskip('ultralytics')
+
+import app
+
+
+def tenengrad_cv16s_interior(gray):
+    # Same math as the CV_16S path in app.tenengrad_focus_measure, but
+    # averaged over the interior only, since the fused kernel skips the
+    # one-pixel border instead of reflecting it.
+    gx = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3).astype(np.int64)
+    gy = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3).astype(np.int64)
+    g2 = (gx * gx + gy * gy)[1:-1, 1:-1]
+    return g2.sum() / g2.size
+
+
+def make_blob_frame():
+    # Dark-field style: sparse bright blobs on black, like the
+    # microscope's glitter/pollen imagery
+    rng = np.random.default_rng(42)
+    img = np.zeros((240, 320), np.uint8)
+    for _ in range(40):
+        x = int(rng.integers(10, 310))
+        y = int(rng.integers(10, 230))
+        cv2.circle(img, (x, y), 3, 255, -1)
+    return img
+
+
+def test_fused_matches_cv16s_on_random_image():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (120, 160), dtype=np.uint8)
+    fused = app.tenengrad_fused(img)
+    ref = tenengrad_cv16s_interior(img)
+    assert fused == pytest.approx(ref, rel=1e-9)
+
+
+def test_fused_ranks_sharp_frame_first():
+    # A synthetic sweep: the unblurred frame must score highest, or
+    # autofocus would drive the stage toward defocus
+    sharp = make_blob_frame()
+    frames = [sharp] + [cv2.GaussianBlur(sharp, (0, 0), s) for s in (1, 2, 4)]
+    scores = [app.tenengrad_fused(f) for f in frames]
+    assert scores.index(max(scores)) == 0